@@ -2,17 +2,21 @@
 # SPDX-License-Identifier: MIT-0
 
 import boto3
+import datetime
 import json
 import os
+import threading
 import time
 import traceback
 
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
 import urllib.parse
+import urllib3
 
 from typing import Optional
 from botocore.config import Config
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 from botocore.exceptions import ClientError
 import re
 
@@ -20,9 +24,101 @@ MODEL_ID = os.environ["MODEL_ID"]
 MODEL_REGION = os.environ["MODEL_REGION"]
 NOTIFIERS = json.loads(os.environ["NOTIFIERS"])
 SUMMARIZERS = json.loads(os.environ["SUMMARIZERS"])
+SUMMARIZE_MAX_WORKERS = 8
+# ストリームレコード全体などの詳細ログは DEBUG に "true" を指定した場合のみ出力する
+DEBUG = os.environ.get("DEBUG", "false").lower() == "true"
+BLOG_FETCH_TIMEOUT = 10
+BLOG_FETCH_USER_AGENT = "whats-new-summary-notifier"
+BLOG_MAX_BYTES = 2_000_000
+BLOG_BODY_MAX_CHARS = 12_000
+# プロンプトキャッシュは "true" を指定した場合のみ有効にする (cdk.json の enablePromptCache から設定される)
+ENABLE_PROMPT_CACHE = os.environ.get("ENABLE_PROMPT_CACHE", "false").lower() == "true"
 
 ssm = boto3.client("ssm")
 
+# 記事の取得と Webhook 宛の POST で TCP/TLS 接続を使い回すためのコネクションプール
+_HTTP = urllib3.PoolManager(
+    maxsize=16,
+    retries=urllib3.Retry(total=3, backoff_factor=0.2),
+)
+
+# 記事の取得は再試行せず BLOG_FETCH_TIMEOUT で打ち切る (リダイレクトは urlopen と同じく 10 回まで)
+BLOG_FETCH_RETRIES = urllib3.Retry(total=None, connect=0, read=0, other=0, redirect=10)
+
+# SSM から取得した Webhook URL のキャッシュ (パラメータ名 -> (取得時刻, URL))
+WEBHOOK_URL_CACHE_TTL = 300
+_WEBHOOK_CACHE: dict[str, tuple[float, str]] = {}
+
+# プロンプト由来の不要なタグ (sanitize_text で使用)
+_UNWANTED_TAGS = [
+    (f"<{name}>", f"</{name}>")
+    for name in (
+        "outputFormat",
+        "summaryRule",
+        "outputLanguage",
+        "instruction",
+        "persona",
+        "input",
+    )
+]
+_MULTI_NL_RE = re.compile(r'\n{3,}')
+
+# 箇条書きのトピック見出しを判定するキーワード (parse_bullet_points で使用)
+_TOPIC_KEYWORDS = ('新機能', '利用可能', '対象', '詳細', '特徴', 'メリット', '更新', '変更', '追加')
+_TOPIC_RE = re.compile('|'.join(map(re.escape, _TOPIC_KEYWORDS)))
+
+
+def _strip_known_tags(text):
+    """Remove blocks enclosed by the unwanted tags in a single linear scan
+
+    Equivalent to removing every `<tag>.*?</tag>` (DOTALL) match, but uses
+    `str.find` instead of a backtracking regex.
+
+    Args:
+        text (str): The text to process
+
+    Returns:
+        str: The text without the unwanted tag blocks
+    """
+    parts = []
+    start = 0  # 未出力部分の先頭
+    pos = text.find('<')
+    while pos >= 0:
+        for open_tag, close_tag in _UNWANTED_TAGS:
+            if text.startswith(open_tag, pos):
+                end = text.find(close_tag, pos + len(open_tag))
+                if end >= 0:
+                    parts.append(text[start:pos])
+                    start = end + len(close_tag)
+                    break
+        pos = text.find('<', max(start, pos + 1))
+
+    if not parts:
+        return text
+    parts.append(text[start:])
+    return ''.join(parts)
+
+
+def _between(text, start, end):
+    """Extract the text between the first `start` delimiter and the following `end` delimiter
+
+    Args:
+        text (str): The text to search
+        start (str): The opening delimiter, e.g. "<summary>"
+        end (str): The closing delimiter, e.g. "</summary>"
+
+    Returns:
+        str: The enclosed text, or None if the delimiters are not found
+    """
+    i = text.find(start)
+    if i < 0:
+        return None
+    i += len(start)
+    j = text.find(end, i)
+    if j < 0:
+        return None
+    return text[i:j]
+
 
 def sanitize_text(text):
     """Remove unwanted XML tags from text
@@ -36,22 +132,11 @@ def sanitize_text(text):
     if not text:
         return ""
     
-    # プロンプト由来の不要なタグを除去
-    unwanted_tags = [
-        r'<outputFormat>.*?</outputFormat>',
-        r'<summaryRule>.*?</summaryRule>',
-        r'<outputLanguage>.*?</outputLanguage>',
-        r'<instruction>.*?</instruction>',
-        r'<persona>.*?</persona>',
-        r'<input>.*?</input>'
-    ]
-    
-    cleaned_text = text
-    for pattern in unwanted_tags:
-        cleaned_text = re.sub(pattern, '', cleaned_text, flags=re.DOTALL)
+    # プロンプト由来の不要なタグを除去 (タグが含まれない通常のケースでは走査しない)
+    cleaned_text = _strip_known_tags(text) if '<' in text else text
     
     # 連続する改行を2つまでに制限
-    cleaned_text = re.sub(r'\n{3,}', '\n\n', cleaned_text)
+    cleaned_text = _MULTI_NL_RE.sub('\n\n', cleaned_text)
     
     return cleaned_text.strip()
 
@@ -66,26 +151,43 @@ def get_blog_content(url):
         str: The content of the blog post, or None if it cannot be retrieved.
     """
 
+    if not url.lower().startswith(("http://", "https://")):
+        print(f"Error accessing {url}, unsupported URL scheme")
+        return None
+
     try:
-        if url.lower().startswith(("http://", "https://")):
-            # Use the `with` statement to ensure the response is properly closed
-            with urllib.request.urlopen(url) as response:
-                html = response.read()
-                if response.getcode() == 200:
-                    soup = BeautifulSoup(html, "html.parser")
-                    main = soup.find("main")
-
-                    if main:
-                        return main.text
-                    else:
-                        return None
+        response = _HTTP.request(
+            "GET",
+            url,
+            headers={"User-Agent": BLOG_FETCH_USER_AGENT},
+            timeout=BLOG_FETCH_TIMEOUT,
+            retries=BLOG_FETCH_RETRIES,
+            preload_content=False,
+        )
+        try:
+            # 巨大なページでメモリを使い切らないよう読み込むサイズに上限を設ける
+            html = response.read(BLOG_MAX_BYTES)
+            if len(html) >= BLOG_MAX_BYTES:
+                # 読み残しのある接続は再利用できないため閉じる
+                response.close()
+        finally:
+            response.release_conn()
+
+        if response.status != 200:
+            print(f"Error accessing {url}, status code {response.status}")
+            return None
+
+        # <main> 以外の要素はツリーを構築せずに読み飛ばす
+        soup = BeautifulSoup(html, "lxml", parse_only=SoupStrainer("main"))
+        main = soup.find("main")
 
+        if main:
+            return main.text
         else:
-            print(f"Error accessing {url}, status code {response.getcode()}")
             return None
 
-    except urllib.error.URLError as e:
-        print(f"Error accessing {url}: {e.reason}")
+    except urllib3.exceptions.HTTPError as e:
+        print(f"Error accessing {url}: {e}")
         return None
 
 
@@ -102,6 +204,10 @@ def get_bedrock_client(
         region (Optional[str]): Optional name of the AWS Region in which the service should be called (e.g. "us-east-1").
             If not specified, AWS_REGION or AWS_DEFAULT_REGION environment variable will be used.
         runtime (Optional[bool]): Optional choice of getting different client to perform operations with the Amazon Bedrock service.
+
+    Returns:
+        tuple: The Bedrock client and the expiration (datetime) of the assumed role credentials, or None if no role
+            was assumed.
     """
 
     if region is None:
@@ -114,6 +220,7 @@ def get_bedrock_client(
     print(f"Create new client\n  Using region: {target_region}")
     session_kwargs = {"region_name": target_region}
     client_kwargs = {**session_kwargs}
+    expiration = None
 
     profile_name = os.environ.get("AWS_PROFILE")
     if profile_name:
@@ -141,6 +248,7 @@ def get_bedrock_client(
             "SecretAccessKey"
         ]
         client_kwargs["aws_session_token"] = response["Credentials"]["SessionToken"]
+        expiration = response["Credentials"]["Expiration"]
 
     if runtime:
         service_name = "bedrock-runtime"
@@ -151,7 +259,40 @@ def get_bedrock_client(
         service_name=service_name, config=retry_config, **client_kwargs
     )
 
-    return bedrock_client
+    return bedrock_client, expiration
+
+
+# Lambda のコンテナ再利用時に使い回す Bedrock クライアント (初回利用時に生成する)
+_BEDROCK_CLIENT = None
+_BEDROCK_CLIENT_EXPIRATION = None
+_BEDROCK_CLIENT_LOCK = threading.Lock()
+# 引き受けたロールの認証情報は期限切れの少し前に取り直す
+BEDROCK_CREDENTIALS_REFRESH_MARGIN = datetime.timedelta(minutes=5)
+
+
+def get_cached_bedrock_client():
+    """Return the Bedrock client shared across invocations, creating it on first use
+
+    When BEDROCK_ASSUME_ROLE is set, the client is rebuilt shortly before the assumed role credentials expire.
+
+    Returns:
+        The boto3 client for Amazon Bedrock Runtime
+    """
+
+    global _BEDROCK_CLIENT, _BEDROCK_CLIENT_EXPIRATION
+
+    # 要約は複数スレッドから並列に呼ばれるため、生成は 1 スレッドに限定する
+    with _BEDROCK_CLIENT_LOCK:
+        if _BEDROCK_CLIENT is None or (
+            _BEDROCK_CLIENT_EXPIRATION is not None
+            and datetime.datetime.now(datetime.timezone.utc)
+            >= _BEDROCK_CLIENT_EXPIRATION - BEDROCK_CREDENTIALS_REFRESH_MARGIN
+        ):
+            _BEDROCK_CLIENT, _BEDROCK_CLIENT_EXPIRATION = get_bedrock_client(
+                assumed_role=os.environ.get("BEDROCK_ASSUME_ROLE", None),
+                region=MODEL_REGION,
+            )
+        return _BEDROCK_CLIENT
 
 
 def summarize_blog(
@@ -169,10 +310,7 @@ def summarize_blog(
         str: The summarized text
     """
 
-    boto3_bedrock = get_bedrock_client(
-        assumed_role=os.environ.get("BEDROCK_ASSUME_ROLE", None),
-        region=MODEL_REGION,
-    )
+    boto3_bedrock = get_cached_bedrock_client()
     # Converse API向けに最適化されたプロンプト
     prompt_data = f"""You are a professional {persona} who analyzes technology updates.
 
@@ -200,6 +338,14 @@ Important: Use ONLY the information provided in the input. Do not add external k
             "text": prompt_data
         }
     ]
+    if ENABLE_PROMPT_CACHE:
+        # システムプロンプトは記事間で共通のため、キャッシュポイントを置いて再利用する
+        system_prompts.append({"cachePoint": {"type": "default"}})
+
+    # 入力トークンを抑えるため、本文は文字数を目安に上限で切り詰める
+    if blog_body and len(blog_body) > BLOG_BODY_MAX_CHARS:
+        print(f"Truncating blog body from {len(blog_body)} to {BLOG_BODY_MAX_CHARS} chars")
+        blog_body = blog_body[:BLOG_BODY_MAX_CHARS]
 
     messages = [
         {
@@ -240,9 +386,9 @@ Important: Use ONLY the information provided in the input. Do not add external k
             print(f"WARNING: Response contains prompt-related XML tags")
         
         # extract content inside <summary> tag with error handling
-        summary_match = re.findall(r"<summary>([\s\S]*?)</summary>", outputText)
-        if summary_match:
-            summary = summary_match[0].strip()
+        summary_match = _between(outputText, "<summary>", "</summary>")
+        if summary_match is not None:
+            summary = summary_match.strip()
             print(f"Summary extracted successfully: {len(summary)} chars")
         else:
             # If no summary tag found, use sanitized output
@@ -253,9 +399,9 @@ Important: Use ONLY the information provided in the input. Do not add external k
             print(f"Using sanitized output as summary: {len(summary)} chars")
         
         # extract content inside <thinking> tag with error handling
-        detail_match = re.findall(r"<thinking>([\s\S]*?)</thinking>", outputText)
-        if detail_match:
-            detail = detail_match[0].strip()
+        detail_match = _between(outputText, "<thinking>", "</thinking>")
+        if detail_match is not None:
+            detail = detail_match.strip()
             print(f"Detail extracted successfully: {len(detail)} chars")
         else:
             # If no thinking tag found, don't use the full outputText to avoid XML tags
@@ -276,48 +422,121 @@ Important: Use ONLY the information provided in the input. Do not add external k
     return summary, detail
 
 
+class TokenBucket:
+    """Simple token bucket rate limiter
+
+    Args:
+        rate (float): Number of tokens added per second
+        capacity (int): Maximum number of tokens that can be accumulated
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+
+    def acquire(self):
+        """Take a token, waiting until one becomes available"""
+
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+            self.updated_at = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            time.sleep((1 - self.tokens) / self.rate)
+
+
+# Webhook の送信間隔を制限する (概ね 2 リクエスト/秒)
+_WEBHOOK_BUCKET = TokenBucket(rate=2, capacity=1)
+
+
+def get_webhook_url(parameter_name):
+    """Retrieve a webhook URL from SSM Parameter Store, caching it across invocations
+
+    Args:
+        parameter_name (str): The name of the SSM parameter holding the webhook URL
+
+    Returns:
+        str: The webhook URL
+    """
+
+    cached = _WEBHOOK_CACHE.get(parameter_name)
+    if cached and time.time() - cached[0] < WEBHOOK_URL_CACHE_TTL:
+        return cached[1]
+
+    ssm_response = ssm.get_parameter(Name=parameter_name, WithDecryption=True)
+    webhook_url = ssm_response["Parameter"]["Value"]
+    _WEBHOOK_CACHE[parameter_name] = (time.time(), webhook_url)
+    return webhook_url
+
+
+def summarize_item(item):
+    """Retrieve and summarize the article of an item
+
+    Args:
+        item (dict): The article to be summarized
+
+    Returns:
+        tuple: The summary and detail text
+    """
+
+    notifier = NOTIFIERS[item["rss_notifier_name"]]
+    summarizer = SUMMARIZERS[notifier["summarizerName"]]
+
+    # Get the blog context
+    content = get_blog_content(item["rss_link"])
+
+    # Summarize the blog
+    return summarize_blog(content, language=summarizer["outputLanguage"], persona=summarizer["persona"])
+
+
 def push_notification(item_list):
     """Notify the arrival of articles
 
+    A failure while processing one article is logged and does not prevent the remaining articles from being notified.
+
     Args:
         item_list (list): List of articles to be notified
     """
 
-    for item in item_list:
-        
-        notifier = NOTIFIERS[item["rss_notifier_name"]]
-        webhook_url_parameter_name = notifier["webhookUrlParameterName"]
-        destination = notifier["destination"]
-        ssm_response = ssm.get_parameter(Name=webhook_url_parameter_name, WithDecryption=True)
-        app_webhook_url = ssm_response["Parameter"]["Value"]
-        
-        item_url = item["rss_link"]
-
-        # Get the blog context
-        content = get_blog_content(item_url)
-
-        # Summarize the blog
-        summarizer = SUMMARIZERS[notifier["summarizerName"]]
-        summary, detail = summarize_blog(content, language=summarizer["outputLanguage"], persona=summarizer["persona"])
-
-        # Add the summary text to notified message
-        item["summary"] = summary
-        item["detail"] = detail
-        if destination == "teams":
-            item["detail"] = item["detail"].replace("。\n", "。\r")
-            msg = create_teams_message(item)
-        else:  # Slack
-            msg = create_slack_message(item)
-
-        encoded_msg = json.dumps(msg).encode("utf-8")
-        print("push_msg:{}".format(item))
-        headers = {
-            "Content-Type": "application/json",
-        }
-        req = urllib.request.Request(app_webhook_url, encoded_msg, headers)
-        with urllib.request.urlopen(req) as res:
-            print(res.read())
-        time.sleep(0.5)
+    # 記事の取得と要約は I/O 待ちが主体で記事ごとに独立しているため並列に実行する
+    with ThreadPoolExecutor(max_workers=SUMMARIZE_MAX_WORKERS) as executor:
+        futures = [executor.submit(summarize_item, item) for item in item_list]
+
+        # 通知は記事の順序を保って送信する
+        for item, future in zip(item_list, futures):
+            try:
+                notifier = NOTIFIERS[item["rss_notifier_name"]]
+                webhook_url_parameter_name = notifier["webhookUrlParameterName"]
+                destination = notifier["destination"]
+                app_webhook_url = get_webhook_url(webhook_url_parameter_name)
+
+                summary, detail = future.result()
+
+                # Add the summary text to notified message
+                item["summary"] = summary
+                item["detail"] = detail
+                build_message = _BUILDERS.get(destination, _BUILDERS["slack"])
+                encoded_msg = build_message(item).encode("utf-8")
+
+                print("push_msg:{}".format(item))
+                headers = {
+                    "Content-Type": "application/json",
+                }
+                _WEBHOOK_BUCKET.acquire()
+                res = _HTTP.request("POST", app_webhook_url, body=encoded_msg, headers=headers)
+                print(res.data)
+                if res.status >= 400:
+                    raise urllib3.exceptions.HTTPError(
+                        f"Error posting to webhook, status code {res.status}"
+                    )
+            except Exception:
+                # 1 件の失敗で残りの記事 (要約済みのものを含む) の通知を失わないよう、ログを出して次へ進む
+                print(f"Failed to notify {item['rss_link']}")
+                traceback.print_exc()
 
 def parse_bullet_points(text):
     """Parse bullet points from text and group them by topic
@@ -345,8 +564,7 @@ def parse_bullet_points(text):
             content = line[2:].strip()
             
             # Check if this is a topic header (contains keywords)
-            topic_keywords = ['新機能', '利用可能', '対象', '詳細', '特徴', 'メリット', '更新', '変更', '追加']
-            is_topic = any(keyword in content for keyword in topic_keywords)
+            is_topic = _TOPIC_RE.search(content) is not None
             
             if is_topic and ':' in content:
                 # This is a new topic group
@@ -444,9 +662,9 @@ def create_slack_message(item):
                     emoji = "🔄"
                 
                 # Create formatted bullet list
-                bullet_text = f"{emoji} *{group['topic']}*"
-                if group['items']:
-                    bullet_text += "\n" + "\n".join([f"• {item}" for item in group['items']])
+                parts = [f"{emoji} *{group['topic']}*"]
+                parts.extend([f"• {item}" for item in group['items']])
+                bullet_text = "\n".join(parts)
                 
                 blocks.append({
                     "type": "section",
@@ -505,23 +723,37 @@ def get_new_entries(blog_entries):
 
     res_list = []
     for entry in blog_entries:
-        print(entry)
+        if DEBUG:
+            print(entry)
         if entry["eventName"] == "INSERT":
+            new_image = entry["dynamodb"]["NewImage"]
             new_data = {
-                "rss_category": entry["dynamodb"]["NewImage"]["category"]["S"],
-                "rss_time": entry["dynamodb"]["NewImage"]["pubtime"]["S"],
-                "rss_title": entry["dynamodb"]["NewImage"]["title"]["S"],
-                "rss_link": entry["dynamodb"]["NewImage"]["url"]["S"],
-                "rss_notifier_name": entry["dynamodb"]["NewImage"]["notifier_name"]["S"],
+                "rss_category": new_image["category"]["S"],
+                "rss_time": new_image["pubtime"]["S"],
+                "rss_title": new_image["title"]["S"],
+                "rss_link": new_image["url"]["S"],
+                "rss_notifier_name": new_image["notifier_name"]["S"],
             }
-            print(new_data)
+            if DEBUG:
+                print(new_data)
             res_list.append(new_data)
         else:  # Do not notify for REMOVE or UPDATE events
             print("skip REMOVE or UPDATE event")
     return res_list
 
 
-def create_teams_message(item):
+def _teams_message_skeleton(title, summary, detail, link):
+    """Build the Adaptive Card message for Microsoft Teams
+
+    Args:
+        title (str): The title of the article
+        summary (str): The summary text
+        detail (str): The detail text
+        link (str): The URL of the article
+
+    Returns:
+        dict: Teams message in Adaptive Card format
+    """
     message = {
         "type": "message",
         "attachments": [
@@ -544,12 +776,12 @@ def create_teams_message(item):
                                             "items": [
                                                 {
                                                     "type": "TextBlock",
-                                                    "text": f'**{item["rss_title"]}**',
+                                                    "text": f'**{title}**',
                                                 },
                                                 {
                                                     "type": "TextBlock",
                                                     "wrap": True,
-                                                    "text": f'{item["summary"]}',
+                                                    "text": summary,
                                                 },
                                             ],
                                         },
@@ -561,7 +793,7 @@ def create_teams_message(item):
                                                 {
                                                     "type": "TextBlock",
                                                     "wrap": True,
-                                                    "text": f'{item["detail"]}',
+                                                    "text": detail,
                                                 }
                                             ],
                                         },
@@ -614,7 +846,7 @@ def create_teams_message(item):
                             "type": "Action.OpenUrl",
                             "title": "Open Link",
                             "wrap": True,
-                            "url": f'{item["rss_link"]}',
+                            "url": link,
                         }
                     ],
                     "msteams": {"width": "Full"},
@@ -627,6 +859,63 @@ def create_teams_message(item):
     return message
 
 
+def _json_escape(value):
+    """Escape a value for embedding inside a JSON string literal"""
+    return json.dumps(str(value))[1:-1]
+
+
+# 構造が固定の Teams メッセージは事前にシリアライズしておき、記事ごとの値だけを埋め込む
+_TEAMS_TEMPLATE = (
+    json.dumps(_teams_message_skeleton("__TITLE__", "__SUMMARY__", "__DETAIL__", "__LINK__"))
+    .replace("%", "%%")
+    .replace("__TITLE__", "%(title)s")
+    .replace("__SUMMARY__", "%(summary)s")
+    .replace("__DETAIL__", "%(detail)s")
+    .replace("__LINK__", "%(link)s")
+)
+
+
+def create_teams_message(item):
+    """Create a Microsoft Teams message using an Adaptive Card
+
+    Args:
+        item (dict): Dictionary containing RSS item information
+
+    Returns:
+        str: Teams message serialized as JSON
+    """
+    # Teams 向けに「。」の後の改行を \r に置き換える
+    detail = item["detail"].replace("。\n", "。\r")
+    return _TEAMS_TEMPLATE % {
+        "title": _json_escape(item["rss_title"]),
+        "summary": _json_escape(item["summary"]),
+        "detail": _json_escape(detail),
+        "link": _json_escape(item["rss_link"]),
+    }
+
+
+def _serialize_slack_message(item):
+    """Create a Slack message serialized as JSON
+
+    Unlike Teams, the Slack blocks vary per item (summary and bullet sections are optional), so the message is
+    serialized with `json.dumps` instead of a pre-serialized template.
+
+    Args:
+        item (dict): Dictionary containing RSS item information
+
+    Returns:
+        str: Slack message serialized as JSON
+    """
+    return json.dumps(create_slack_message(item))
+
+
+# 通知先 (destination) ごとのメッセージ生成関数。未知の通知先は Slack として扱う
+_BUILDERS = {
+    "teams": create_teams_message,
+    "slack": _serialize_slack_message,
+}
+
+
 def handler(event, context):
     """Notify about blog entries registered in DynamoDB
 
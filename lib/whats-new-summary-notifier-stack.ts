@@ -20,6 +20,7 @@ export class WhatsNewSummaryNotifierStack extends Stack {
 
     const modelRegion = this.node.tryGetContext('modelRegion');
     const modelId = this.node.tryGetContext('modelId');
+    const enablePromptCache: boolean = this.node.tryGetContext('enablePromptCache') ?? false;
 
     const notifiers: [] = this.node.tryGetContext('notifiers');
     const summarizers: [] = this.node.tryGetContext('summarizers');
@@ -82,6 +83,7 @@ export class WhatsNewSummaryNotifierStack extends Stack {
       environment: {
         MODEL_ID: modelId,
         MODEL_REGION: modelRegion,
+        ENABLE_PROMPT_CACHE: String(enablePromptCache),
         NOTIFIERS: JSON.stringify(notifiers),
         SUMMARIZERS: JSON.stringify(summarizers),
       },